@@ -1,5 +1,7 @@
 import argparse
 import os
+import queue
+import threading
 import time
 
 import cv2
@@ -30,14 +32,27 @@ def parse_args():
         action="store_true",
         help="whether to save the inference result of image/video",
     )
+    parser.add_argument(
+        "--fourcc",
+        default="mp4v",
+        help="fourcc of the codec used to save the video result, eg. mp4v, avc1",
+    )
+    parser.add_argument(
+        "--display_every",
+        type=int,
+        default=1,
+        help="show every n-th frame of video/webcam, 0 to disable the window. "
+        "The saved result keeps all frames",
+    )
     args = parser.parse_args()
     return args
 
 
 class Predictor(object):
-    def __init__(self, cfg, model_path, logger, device="cuda:0"):
+    def __init__(self, cfg, model_path, logger, device="cuda:0", verbose=False):
         self.cfg = cfg
         self.device = device
+        self.verbose = verbose
         model = build_model(cfg.model)
         ckpt = torch.load(model_path, map_location=lambda storage, loc: storage)
         load_model_weight(model, ckpt, logger)
@@ -68,15 +83,18 @@ class Predictor(object):
         meta = naive_collate([meta])
         meta["img"] = stack_batch_img(meta["img"], divisible=32)
         with torch.no_grad():
-            results = self.model.inference(meta)
+            results = self.model.inference(meta, verbose=self.verbose)
         return meta, results
 
-    def visualize(self, dets, meta, class_names, score_thres, wait=0):
-        time1 = time.time()
+    def visualize(self, dets, meta, class_names, score_thres, wait=0, show=True):
+        if self.verbose:
+            time1 = time.time()
         result_img = self.model.head.show_result(
-            meta["raw_img"][0], dets, class_names, score_thres=score_thres, show=True
+            meta["raw_img"][0], dets, class_names, score_thres=score_thres, show=show
         )
-        print("viz time: {:.3f}s".format(time.time() - time1))
+        if self.verbose:
+            # ends the line of the forward and decode time printed by inference
+            print("viz time: {:.3f}s".format(time.time() - time1))
         return result_img
 
 
@@ -91,6 +109,47 @@ def get_image_list(path):
     return image_names
 
 
+def read_frames(cap, frame_queue, stop_event, drop_frames=False):
+    """Decode frames in a background thread so capture overlaps inference.
+    A ``None`` is put into the queue once the stream is exhausted. With
+    ``drop_frames``, a queued frame that is not taken yet is replaced by the
+    newest one, so a live source does not pile up latency when inference is
+    slower than capture. Use it with a queue of size 1 to bound the latency
+    to one frame."""
+    while not stop_event.is_set():
+        ret_val, frame = cap.read()
+        if not ret_val:
+            frame = None
+        elif drop_frames:
+            try:
+                frame_queue.put_nowait(frame)
+            except queue.Full:
+                try:
+                    frame_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                # this thread is the only producer, so there is room now
+                frame_queue.put_nowait(frame)
+            continue
+        while not stop_event.is_set():
+            try:
+                frame_queue.put(frame, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if frame is None:
+            break
+
+
+def write_frames(vid_writer, result_queue):
+    """Encode result frames in a background thread until a ``None`` arrives."""
+    while True:
+        frame = result_queue.get()
+        if frame is None:
+            break
+        vid_writer.write(frame)
+
+
 def main():
     args = parse_args()
     local_rank = 0
@@ -99,7 +158,10 @@ def main():
 
     load_config(cfg, args.config)
     logger = Logger(local_rank, use_tensorboard=False)
-    predictor = Predictor(cfg, args.model, logger, device="cuda:0")
+    # per frame timing logs would slow down the video and webcam demo
+    predictor = Predictor(
+        cfg, args.model, logger, device="cuda:0", verbose=args.demo == "image"
+    )
     logger.log('Press "Esc", "q" or "Q" to exit.')
     current_time = time.localtime()
     if args.demo == "image":
@@ -123,6 +185,9 @@ def main():
                 break
     elif args.demo == "video" or args.demo == "webcam":
         cap = cv2.VideoCapture(args.path if args.demo == "video" else args.camid)
+        if args.demo == "webcam":
+            # only keep the latest frame in the driver buffer
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)  # float
         height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)  # float
         fps = cap.get(cv2.CAP_PROP_FPS)
@@ -137,20 +202,58 @@ def main():
         )
         print(f"save_path is {save_path}")
         vid_writer = cv2.VideoWriter(
-            save_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (int(width), int(height))
+            save_path,
+            cv2.VideoWriter_fourcc(*args.fourcc),
+            fps,
+            (int(width), int(height)),
+        )
+        # capture -> inference -> encode run as a pipeline, the bounded queues
+        # keep a few frames in flight and preserve the frame order. The webcam
+        # only keeps the latest frame to not lag behind the camera
+        stop_event = threading.Event()
+        frame_queue = queue.Queue(maxsize=1 if args.demo == "webcam" else 4)
+        result_queue = queue.Queue(maxsize=4)
+        reader = threading.Thread(
+            target=read_frames,
+            args=(cap, frame_queue, stop_event, args.demo == "webcam"),
+            daemon=True,
+        )
+        writer = threading.Thread(
+            target=write_frames, args=(vid_writer, result_queue), daemon=True
         )
-        while True:
-            ret_val, frame = cap.read()
-            if ret_val:
+        reader.start()
+        writer.start()
+        # the threads are stopped and the video is finalized also on Ctrl-C,
+        # the only way to stop the webcam demo without a window
+        try:
+            frame_id = 0
+            while True:
+                frame = frame_queue.get()
+                if frame is None:
+                    break
                 meta, res = predictor.inference(frame)
-                result_frame = predictor.visualize(res[0], meta, cfg.class_names, 0.35)
+                # imshow and waitKey go through the GUI event loop, so only every
+                # n-th frame is shown while the writer still gets all of them
+                show = args.display_every > 0 and frame_id % args.display_every == 0
+                frame_id += 1
+                if not (show or args.save_result):
+                    continue
+                result_frame = predictor.visualize(
+                    res[0], meta, cfg.class_names, 0.35, show=show
+                )
                 if args.save_result:
-                    vid_writer.write(result_frame)
-                ch = cv2.waitKey(1)
-                if ch == 27 or ch == ord("q") or ch == ord("Q"):
-                    break
-            else:
-                break
+                    result_queue.put(result_frame)
+                if show:
+                    ch = cv2.waitKey(1)
+                    if ch == 27 or ch == ord("q") or ch == ord("Q"):
+                        break
+        finally:
+            stop_event.set()
+            result_queue.put(None)
+            reader.join()
+            writer.join()
+            cap.release()
+            vid_writer.release()
 
 
 if __name__ == "__main__":
@@ -1 +1,569 @@
-# Working in progress
+import argparse
+import collections
+import math
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import openvino as ov
+
+from nanodet.util import Logger, cfg, load_config, overlay_bbox_cv
+from nanodet.util.path import mkdir
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+image_ext = [".jpg", ".jpeg", ".webp", ".bmp", ".png"]
+video_ext = ["mp4", "mov", "avi", "mkv"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="NanoDet demo with OpenVINO runtime. The model is an onnx "
+        "exported by tools/export_onnx.py or an OpenVINO IR converted from it."
+    )
+    parser.add_argument(
+        "demo", default="image", help="demo type, eg. image, video and webcam"
+    )
+    parser.add_argument("--config", help="model config file path")
+    parser.add_argument("--model", help="onnx or OpenVINO IR (.xml) model path")
+    parser.add_argument("--device", default="CPU", help="OpenVINO device name")
+    parser.add_argument("--path", default="./demo", help="path to images or video")
+    parser.add_argument("--camid", type=int, default=0, help="webcam demo camera id")
+    parser.add_argument(
+        "--save_result",
+        action="store_true",
+        help="whether to save the inference result of image/video",
+    )
+    parser.add_argument(
+        "--fourcc",
+        default="mp4v",
+        help="fourcc of the codec used to save the video result, eg. mp4v, avc1",
+    )
+    parser.add_argument(
+        "--precision_hint",
+        default=None,
+        help="OpenVINO inference precision hint, eg. f32, bf16, f16. "
+        "By default the device decides.",
+    )
+    parser.add_argument(
+        "--ov_preprocess",
+        action="store_true",
+        help="resize and normalize inside the OpenVINO model, which only uploads "
+        "the uint8 frame to GPU or NPU devices",
+    )
+    parser.add_argument(
+        "--display_every",
+        type=int,
+        default=1,
+        help="show every n-th frame of video/webcam, 0 to disable the window. "
+        "The saved result keeps all frames",
+    )
+    args = parser.parse_args()
+    return args
+
+
+if njit is not None:
+
+    @njit(cache=True, fastmath=True)
+    def _decode_and_filter(
+        preds,
+        points,
+        strides,
+        num_classes,
+        reg_max,
+        score_thr,
+        input_width,
+        input_height,
+        bboxes,
+        scores,
+        labels,
+    ):
+        """Fused score filter, integral, bbox decoding and clipping in one pass
+        over the points. Candidates are written to the preallocated ``bboxes``,
+        ``scores`` and ``labels`` in the same order as ``np.nonzero`` gives.
+
+        Returns:
+            int: Number of written candidates.
+        """
+        num = 0
+        dis = np.empty(4, dtype=np.float32)
+        for i in range(preds.shape[0]):
+            max_score = preds[i, 0]
+            for c in range(1, num_classes):
+                max_score = max(max_score, preds[i, c])
+            if max_score <= score_thr:
+                continue
+            for j in range(4):
+                offset = num_classes + j * (reg_max + 1)
+                alpha = preds[i, offset]
+                for k in range(1, reg_max + 1):
+                    alpha = max(alpha, preds[i, offset + k])
+                numerator = 0.0
+                denominator = 0.0
+                for k in range(reg_max + 1):
+                    e = np.exp(preds[i, offset + k] - alpha)
+                    numerator += e * k
+                    denominator += e
+                dis[j] = numerator / denominator * strides[i, 0]
+            x1 = min(max(points[i, 0] - dis[0], 0.0), input_width)
+            y1 = min(max(points[i, 1] - dis[1], 0.0), input_height)
+            x2 = min(max(points[i, 0] + dis[2], 0.0), input_width)
+            y2 = min(max(points[i, 1] + dis[3], 0.0), input_height)
+            for c in range(num_classes):
+                if preds[i, c] > score_thr:
+                    bboxes[num, 0] = x1
+                    bboxes[num, 1] = y1
+                    bboxes[num, 2] = x2
+                    bboxes[num, 3] = y2
+                    scores[num] = preds[i, c]
+                    labels[num] = c
+                    num += 1
+        return num
+
+
+class NanoDetPostProcessor(object):
+    """Decode the raw output of an exported NanoDet-Plus model with NumPy.
+
+    Torch free equivalent of ``NanoDetPlusHead.get_bboxes`` and
+    ``multiclass_nms`` for the single image case.
+
+    Args:
+        input_size (tuple[int]): Network input size in (width, height).
+        num_classes (int): Number of categories.
+        reg_max (int): The maximal value of the discrete set. Default: 7.
+        strides (list[int]): Strides of the multi-level feature maps.
+        score_thr (float): Minimum score of the kept detections.
+        iou_thr (float): NMS IoU threshold.
+        max_num (int): Maximum number of detections after NMS.
+    """
+
+    def __init__(
+        self,
+        input_size,
+        num_classes,
+        reg_max=7,
+        strides=[8, 16, 32, 64],
+        score_thr=0.05,
+        iou_thr=0.6,
+        max_num=100,
+    ):
+        self.input_size = input_size
+        self.num_classes = num_classes
+        self.reg_max = reg_max
+        self.strides = strides
+        self.score_thr = score_thr
+        self.iou_thr = iou_thr
+        self.max_num = max_num
+        center_priors = self._generate_center_priors()
+        # keep the points and strides as separate contiguous arrays instead of
+        # slicing strided columns out of the priors on every frame
+        self.center_points = np.ascontiguousarray(center_priors[:, :2])
+        self.center_strides = np.ascontiguousarray(center_priors[:, 2:3])
+        # the NumPy decoding works on whole (n, 4) arrays, points in
+        # [x, y, x, y] format plus distances scaled by the signed strides,
+        # NumPy is slow when broadcasting a single row over the array
+        self.center_points_xyxy = np.concatenate(
+            [self.center_points, self.center_points], axis=1
+        )
+        self.center_strides_signed = self.center_strides * np.array(
+            [-1, -1, 1, 1], dtype=np.float32
+        )
+        self.project = np.linspace(0, reg_max, reg_max + 1, dtype=np.float32)
+        if njit is not None:
+            # output buffers of the fused decoding, one slot per point and class
+            num_candidates = self.center_points.shape[0] * num_classes
+            self._bboxes = np.empty((num_candidates, 4), dtype=np.float32)
+            self._scores = np.empty(num_candidates, dtype=np.float32)
+            self._labels = np.empty(num_candidates, dtype=np.int32)
+        # rescaled detections in [x0, y0, x1, y1, score] format, reused by
+        # every frame instead of allocating the scaled and clipped copies
+        self._dets = np.empty((max_num, 5), dtype=np.float32)
+
+    def _generate_center_priors(self):
+        """Generate center priors in [x, y, stride, stride] format, same as
+        ``NanoDetPlusHead.get_single_level_center_priors``."""
+        input_width, input_height = self.input_size
+        mlvl_center_priors = []
+        for stride in self.strides:
+            h = math.ceil(input_height / stride)
+            w = math.ceil(input_width / stride)
+            y, x = np.meshgrid(
+                np.arange(h, dtype=np.float32) * stride,
+                np.arange(w, dtype=np.float32) * stride,
+                indexing="ij",
+            )
+            strides = np.full(h * w, stride, dtype=np.float32)
+            mlvl_center_priors.append(
+                np.stack([x.ravel(), y.ravel(), strides, strides], axis=-1)
+            )
+        return np.concatenate(mlvl_center_priors, axis=0)
+
+    def _integral_distribution_project(self, reg_preds):
+        """Expectation of the regression distributions, see ``Integral``."""
+        x = reg_preds.reshape(-1, 4, self.reg_max + 1)
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return (x * self.project).sum(axis=-1) / x.sum(axis=-1)
+
+    def _distance2bbox(self, points, distance):
+        """Decode distance prediction to bounding box clipped to the input
+        size, see ``nanodet.util.distance2bbox``. The points are in
+        [x, y, x, y] format and the distances are signed as [-l, -t, r, b], the
+        bboxes are written into ``distance``."""
+        bboxes = np.add(points, distance, out=distance)
+        # only the shorter side needs a second clip on its strided columns
+        input_width, input_height = self.input_size
+        np.clip(bboxes, 0, max(input_width, input_height), out=bboxes)
+        if input_height < input_width:
+            np.minimum(bboxes[:, 1::2], input_height, out=bboxes[:, 1::2])
+        elif input_width < input_height:
+            np.minimum(bboxes[:, 0::2], input_width, out=bboxes[:, 0::2])
+        return bboxes
+
+    def _decode_numpy(self, preds):
+        scores = preds[:, : self.num_classes]
+        # only decode the points which have a score above the threshold
+        inds, labels = np.nonzero(scores > self.score_thr)
+        scores = scores[inds, labels]
+        labels = labels.astype(np.int32)
+        dis_preds = (
+            self._integral_distribution_project(preds[inds, self.num_classes :])
+            * self.center_strides_signed[inds]
+        )
+        bboxes = self._distance2bbox(self.center_points_xyxy[inds], dis_preds)
+        return bboxes, scores, labels
+
+    def _decode_numba(self, preds):
+        input_width, input_height = self.input_size
+        num = _decode_and_filter(
+            preds,
+            self.center_points,
+            self.center_strides,
+            self.num_classes,
+            self.reg_max,
+            self.score_thr,
+            input_width,
+            input_height,
+            self._bboxes,
+            self._scores,
+            self._labels,
+        )
+        return self._bboxes[:num], self._scores[:num], self._labels[:num]
+
+    def __call__(self, preds, raw_shape):
+        """Decode bboxes and rescale them to the original image size.
+
+        Args:
+            preds (np.ndarray): Model output of shape
+                (1, num_points, num_classes + 4 * (reg_max + 1)). Class scores
+                are already activated by sigmoid in the exported model.
+            raw_shape (tuple[int]): Original image size in (height, width).
+
+        Returns:
+            tuple[np.ndarray]: Bboxes of shape (k, 5) in [x0, y0, x1, y1, score]
+                format sorted by score and labels of shape (k,), which
+                ``overlay_bbox_cv`` takes directly. The bboxes are a view of a
+                buffer reused by the next call.
+        """
+        # a model converted with a half precision output would otherwise
+        # recompile the numba kernel and upcast in every NumPy operation
+        preds = preds.astype(np.float32, copy=False)
+        if njit is not None:
+            bboxes, scores, labels = self._decode_numba(preds[0])
+        else:
+            bboxes, scores, labels = self._decode_numpy(preds[0])
+
+        keep = cv2.dnn.NMSBoxesBatched(
+            np.concatenate([bboxes[:, :2], bboxes[:, 2:] - bboxes[:, :2]], axis=1),
+            scores,
+            labels,
+            self.score_thr,
+            self.iou_thr,
+        )
+        keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+        keep = keep[np.argsort(-scores[keep], kind="stable")][: self.max_num]
+
+        input_width, input_height = self.input_size
+        raw_height, raw_width = raw_shape
+        scale = np.array(
+            [
+                raw_width / input_width,
+                raw_height / input_height,
+                raw_width / input_width,
+                raw_height / input_height,
+            ],
+            dtype=np.float32,
+        )
+        dets = self._dets[: len(keep)]
+        np.multiply(bboxes[keep], scale, out=dets[:, :4])
+        np.clip(
+            dets[:, :4],
+            0,
+            np.array([raw_width, raw_height, raw_width, raw_height], np.float32),
+            out=dets[:, :4],
+        )
+        dets[:, 4] = scores[keep]
+        return dets, labels[keep]
+
+
+class Predictor(object):
+    def __init__(
+        self,
+        cfg,
+        model_path,
+        logger,
+        device="CPU",
+        perf_hint="LATENCY",
+        precision_hint=None,
+        ov_preprocess=False,
+    ):
+        self.cfg = cfg
+        self.logger = logger
+        if cfg.data.val.keep_ratio:
+            logger.log("keep_ratio is not supported, the image will be stretched.")
+        self.input_size = tuple(cfg.data.val.input_size)
+        mean, std = cfg.data.val.pipeline.normalize
+        self.blob_params = cv2.dnn.Image2BlobParams(
+            scalefactor=tuple(1.0 / s for s in std),
+            size=self.input_size,
+            mean=tuple(mean),
+            swapRB=False,
+        )
+
+        core = ov.Core()
+        model = core.read_model(model_path)
+        self.ov_preprocess = ov_preprocess
+        if ov_preprocess:
+            model = self._build_preprocess(model, mean, std)
+        config = {"PERFORMANCE_HINT": perf_hint}
+        if precision_hint is not None:
+            config["INFERENCE_PRECISION_HINT"] = precision_hint
+        self.compiled_model = core.compile_model(model, device, config)
+        # the throughput hint splits the device into several streams, which
+        # are only kept busy with as many requests in flight
+        num_requests = self.compiled_model.get_property(
+            "OPTIMAL_NUMBER_OF_INFER_REQUESTS"
+        )
+        logger.log(f"OpenVINO {perf_hint} mode with {num_requests} infer requests.")
+        # the input tensors share memory with these buffers, preprocess writes
+        # every frame in place so nothing is allocated or copied per frame
+        input_width, input_height = self.input_size
+        self.infer_requests = []
+        self.input_blobs = []
+        for _ in range(num_requests):
+            infer_request = self.compiled_model.create_infer_request()
+            if not ov_preprocess:
+                input_blob = np.empty((1, 3, input_height, input_width), np.float32)
+                infer_request.set_input_tensor(
+                    ov.Tensor(input_blob, shared_memory=True)
+                )
+                self.input_blobs.append(input_blob)
+            self.infer_requests.append(infer_request)
+
+        head_cfg = cfg.model.arch.head
+        self.post_processor = NanoDetPostProcessor(
+            self.input_size,
+            head_cfg.num_classes,
+            reg_max=head_cfg.reg_max,
+            strides=head_cfg.strides,
+        )
+
+    @staticmethod
+    def _build_preprocess(model, mean, std):
+        """Embed resize, normalize and the NHWC to NCHW conversion into the
+        model, so it takes the BGR uint8 image of any size as it is."""
+        ppp = ov.preprocess.PrePostProcessor(model)
+        ppp.input().tensor().set_element_type(ov.Type.u8).set_layout(
+            ov.Layout("NHWC")
+        ).set_spatial_dynamic_shape()
+        ppp.input().preprocess().resize(
+            ov.preprocess.ResizeAlgorithm.RESIZE_LINEAR
+        ).convert_element_type(ov.Type.f32).mean(list(mean)).scale(list(std))
+        ppp.input().model().set_layout(ov.Layout("NCHW"))
+        return ppp.build()
+
+    def preprocess(self, img, index=0):
+        """Resize, normalize and pack the image into the input buffer of the
+        ``index``-th infer request. With ``ov_preprocess`` the input tensor
+        shares memory with the image instead, so it must not be modified until
+        the request is done."""
+        if self.ov_preprocess:
+            img = np.ascontiguousarray(img)
+            self.infer_requests[index].set_input_tensor(
+                ov.Tensor(img[None], shared_memory=True)
+            )
+            return img
+        input_blob = self.input_blobs[index]
+        cv2.dnn.blobFromImageWithParams(img, input_blob, self.blob_params)
+        return input_blob
+
+    def postprocess(self, img, index=0):
+        # the output is a view of the request memory, it is decoded before the
+        # request is started again so no copy is needed even in the pipeline
+        preds = self.infer_requests[index].get_output_tensor(0).data
+        return self.post_processor(preds, img.shape[:2])
+
+    def inference(self, img):
+        if isinstance(img, str):
+            img = cv2.imread(img)
+        self.preprocess(img)
+        self.infer_requests[0].infer()
+        dets = self.postprocess(img)
+        return img, dets
+
+    def inference_stream(self, frames):
+        """Run inference on an iterable of frames and yield ``(frame, dets)``
+        in order, keeping one frame in flight per infer request."""
+        pending = collections.deque()
+        for i, frame in enumerate(frames):
+            if len(pending) == len(self.infer_requests):
+                yield self._wait(*pending.popleft())
+            # the request of the oldest frame is the one free to reuse
+            index = i % len(self.infer_requests)
+            self.preprocess(frame, index)
+            self.infer_requests[index].start_async()
+            pending.append((frame, index))
+        while pending:
+            yield self._wait(*pending.popleft())
+
+    def _wait(self, img, index):
+        self.infer_requests[index].wait()
+        return img, self.postprocess(img, index)
+
+    def visualize(self, dets, img, class_names, score_thres, show=True):
+        result_img = overlay_bbox_cv(img, dets, class_names, score_thresh=score_thres)
+        if show:
+            cv2.imshow("det", result_img)
+        return result_img
+
+
+def get_image_list(path):
+    image_names = []
+    for maindir, subdir, file_name_list in os.walk(path):
+        for filename in file_name_list:
+            apath = os.path.join(maindir, filename)
+            ext = os.path.splitext(apath)[1]
+            if ext in image_ext:
+                image_names.append(apath)
+    return image_names
+
+
+def iter_frames(cap):
+    while True:
+        ret_val, frame = cap.read()
+        if not ret_val:
+            break
+        yield frame
+
+
+def write_frames(vid_writer, result_queue):
+    """Encode result frames in a background thread until a ``None`` arrives."""
+    while True:
+        frame = result_queue.get()
+        if frame is None:
+            break
+        vid_writer.write(frame)
+
+
+def main():
+    args = parse_args()
+    local_rank = 0
+
+    load_config(cfg, args.config)
+    logger = Logger(local_rank, use_tensorboard=False)
+    # several frames in flight only pay off for video files, images and
+    # webcam frames are shown as soon as possible
+    predictor = Predictor(
+        cfg,
+        args.model,
+        logger,
+        device=args.device,
+        perf_hint="THROUGHPUT" if args.demo == "video" else "LATENCY",
+        precision_hint=args.precision_hint,
+        ov_preprocess=args.ov_preprocess,
+    )
+    logger.log('Press "Esc", "q" or "Q" to exit.')
+    current_time = time.localtime()
+    if args.demo == "image":
+        if os.path.isdir(args.path):
+            files = get_image_list(args.path)
+        else:
+            files = [args.path]
+        files.sort()
+        for image_name in files:
+            img, dets = predictor.inference(image_name)
+            result_image = predictor.visualize(dets, img, cfg.class_names, 0.35)
+            if args.save_result:
+                save_folder = os.path.join(
+                    cfg.save_dir, time.strftime("%Y_%m_%d_%H_%M_%S", current_time)
+                )
+                mkdir(local_rank, save_folder)
+                save_file_name = os.path.join(save_folder, os.path.basename(image_name))
+                cv2.imwrite(save_file_name, result_image)
+            ch = cv2.waitKey(0)
+            if ch == 27 or ch == ord("q") or ch == ord("Q"):
+                break
+    elif args.demo == "video" or args.demo == "webcam":
+        cap = cv2.VideoCapture(args.path if args.demo == "video" else args.camid)
+        if args.demo == "webcam":
+            # only keep the latest frame in the driver buffer
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)  # float
+        height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)  # float
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        save_folder = os.path.join(
+            cfg.save_dir, time.strftime("%Y_%m_%d_%H_%M_%S", current_time)
+        )
+        mkdir(local_rank, save_folder)
+        save_path = (
+            os.path.join(save_folder, args.path.replace("\\", "/").split("/")[-1])
+            if args.demo == "video"
+            else os.path.join(save_folder, "camera.mp4")
+        )
+        print(f"save_path is {save_path}")
+        vid_writer = cv2.VideoWriter(
+            save_path,
+            cv2.VideoWriter_fourcc(*args.fourcc),
+            fps,
+            (int(width), int(height)),
+        )
+        # encoding runs in the background so a slow codec does not stall
+        # inference, the bounded queue keeps the frame order
+        result_queue = queue.Queue(maxsize=4)
+        writer = threading.Thread(
+            target=write_frames, args=(vid_writer, result_queue), daemon=True
+        )
+        writer.start()
+        # the writer is drained and the video is finalized also on Ctrl-C, the
+        # only way to stop the webcam demo without a window
+        try:
+            frames = predictor.inference_stream(iter_frames(cap))
+            for frame_id, (frame, dets) in enumerate(frames):
+                # imshow and waitKey go through the GUI event loop, so only every
+                # n-th frame is shown while the writer still gets all of them
+                show = args.display_every > 0 and frame_id % args.display_every == 0
+                if not (show or args.save_result):
+                    continue
+                result_frame = predictor.visualize(
+                    dets, frame, cfg.class_names, 0.35, show=show
+                )
+                if args.save_result:
+                    result_queue.put(result_frame)
+                if show:
+                    ch = cv2.waitKey(1)
+                    if ch == 27 or ch == ord("q") or ch == ord("Q"):
+                        break
+        finally:
+            result_queue.put(None)
+            writer.join()
+            cap.release()
+            vid_writer.release()
+
+
+if __name__ == "__main__":
+    main()
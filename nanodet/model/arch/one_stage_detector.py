@@ -45,26 +45,30 @@ class OneStageDetector(nn.Module):
             x = self.head(x)
         return x
 
-    def inference(self, meta):
+    def inference(self, meta, verbose=True):
+        """Run the model and post processing. With ``verbose`` the forward and
+        decode time is printed, which synchronizes cuda to measure it."""
         with torch.no_grad():
-            is_cuda_available = torch.cuda.is_available()
-            if is_cuda_available:
+            synchronize = verbose and torch.cuda.is_available()
+            if synchronize:
                 torch.cuda.synchronize()
 
             time1 = time.time()
             preds = self(meta["img"])
 
-            if is_cuda_available:
+            if synchronize:
                 torch.cuda.synchronize()
 
             time2 = time.time()
-            print("forward time: {:.3f}s".format((time2 - time1)), end=" | ")
+            if verbose:
+                print("forward time: {:.3f}s".format((time2 - time1)), end=" | ")
             results = self.head.post_process(preds, meta)
 
-            if is_cuda_available:
+            if synchronize:
                 torch.cuda.synchronize()
 
-            print("decode time: {:.3f}s".format((time.time() - time2)), end=" | ")
+            if verbose:
+                print("decode time: {:.3f}s".format((time.time() - time2)), end=" | ")
         return results
 
     def forward_train(self, gt_meta):
@@ -5,7 +5,6 @@ import numpy as np
 import torch
 import torch.distributed as dist
 import torch.nn as nn
-import torch.nn.functional as F
 
 from nanodet.util import (
     bbox2distance,
@@ -62,8 +61,11 @@ class Integral(nn.Module):
                 offsets from the box center in four directions, shape (N, 4).
         """
         shape = x.size()
-        x = F.softmax(x.reshape(*shape[:-1], 4, self.reg_max + 1), dim=-1)
-        x = F.linear(x, self.project.type_as(x)).reshape(*shape[:-1], 4)
+        x = x.reshape(*shape[:-1], 4, self.reg_max + 1)
+        # softmax folded into the projection: sum(e * y_i) / sum(e), which
+        # skips normalizing the whole distribution before the reduction
+        x = (x - x.max(dim=-1, keepdim=True)[0]).exp_()
+        x = (x * self.project.type_as(x)).sum(dim=-1) / x.sum(dim=-1)
         return x
 
 
@@ -621,17 +623,16 @@ class GFLHead(nn.Module):
         center_priors = torch.cat(mlvl_center_priors, dim=1)
         dis_preds = self.distribution_project(reg_preds) * center_priors[..., 2, None]
         bboxes = distance2bbox(center_priors[..., :2], dis_preds, max_shape=input_shape)
-        scores = cls_preds.sigmoid()
+        # add a dummy background class at the end of all labels
+        # same with mmdetection2.0, the sigmoid is written into the padded
+        # tensor directly instead of padding and concatenating every image
+        scores = cls_preds.new_zeros(*cls_preds.shape[:-1], cls_preds.shape[-1] + 1)
+        scores[..., :-1] = cls_preds.sigmoid()
         result_list = []
         for i in range(b):
-            # add a dummy background class at the end of all labels
-            # same with mmdetection2.0
-            score, bbox = scores[i], bboxes[i]
-            padding = score.new_zeros(score.shape[0], 1)
-            score = torch.cat([score, padding], dim=1)
             results = multiclass_nms(
-                bbox,
-                score,
+                bboxes[i],
+                scores[i],
                 score_thr=0.05,
                 nms_cfg=dict(type="nms", iou_threshold=0.6),
                 max_num=100,
@@ -73,6 +73,9 @@ class NanoDetPlusHead(nn.Module):
 
         self.assigner = DynamicSoftLabelAssigner(**assigner_cfg)
         self.distribution_project = Integral(self.reg_max)
+        # center priors only depend on the input size, keyed by
+        # (input_shape, dtype, device)
+        self._center_priors_cache = {}
 
         self.loss_qfl = QualityFocalLoss(
             beta=self.loss_cfg.loss_qfl.beta,
@@ -167,23 +170,9 @@ class NanoDetPlusHead(nn.Module):
         if gt_bboxes_ignore is None:
             gt_bboxes_ignore = [None for _ in range(batch_size)]
 
-        input_height, input_width = gt_meta["img"].shape[2:]
-        featmap_sizes = [
-            (math.ceil(input_height / stride), math.ceil(input_width) / stride)
-            for stride in self.strides
-        ]
-        # get grid cells of one image
-        mlvl_center_priors = [
-            self.get_single_level_center_priors(
-                batch_size,
-                featmap_sizes[i],
-                stride,
-                dtype=torch.float32,
-                device=device,
-            )
-            for i, stride in enumerate(self.strides)
-        ]
-        center_priors = torch.cat(mlvl_center_priors, dim=1)
+        center_priors = self.get_center_priors(
+            batch_size, gt_meta["img"].shape[2:], dtype=torch.float32, device=device
+        )
 
         cls_preds, reg_preds = preds.split(
             [self.num_classes, 4 * (self.reg_max + 1)], dim=-1
@@ -476,35 +465,21 @@ class NanoDetPlusHead(nn.Module):
         input_height, input_width = img_metas["img"].shape[2:]
         input_shape = (input_height, input_width)
 
-        featmap_sizes = [
-            (math.ceil(input_height / stride), math.ceil(input_width) / stride)
-            for stride in self.strides
-        ]
-        # get grid cells of one image
-        mlvl_center_priors = [
-            self.get_single_level_center_priors(
-                b,
-                featmap_sizes[i],
-                stride,
-                dtype=torch.float32,
-                device=device,
-            )
-            for i, stride in enumerate(self.strides)
-        ]
-        center_priors = torch.cat(mlvl_center_priors, dim=1)
+        center_priors = self.get_center_priors(
+            b, input_shape, dtype=torch.float32, device=device
+        )
         dis_preds = self.distribution_project(reg_preds) * center_priors[..., 2, None]
         bboxes = distance2bbox(center_priors[..., :2], dis_preds, max_shape=input_shape)
-        scores = cls_preds.sigmoid()
+        # add a dummy background class at the end of all labels
+        # same with mmdetection2.0, the sigmoid is written into the padded
+        # tensor directly instead of padding and concatenating every image
+        scores = cls_preds.new_zeros(*cls_preds.shape[:-1], cls_preds.shape[-1] + 1)
+        scores[..., :-1] = cls_preds.sigmoid()
         result_list = []
         for i in range(b):
-            # add a dummy background class at the end of all labels
-            # same with mmdetection2.0
-            score, bbox = scores[i], bboxes[i]
-            padding = score.new_zeros(score.shape[0], 1)
-            score = torch.cat([score, padding], dim=1)
             results = multiclass_nms(
-                bbox,
-                score,
+                bboxes[i],
+                scores[i],
                 score_thr=0.05,
                 nms_cfg=dict(type="nms", iou_threshold=0.6),
                 max_num=100,
@@ -512,6 +487,41 @@ class NanoDetPlusHead(nn.Module):
             result_list.append(results)
         return result_list
 
+    def get_center_priors(self, batch_size, input_shape, dtype, device):
+        """Generate centers of all levels of feature maps. The priors of one
+        image are cached and expanded to the batch size.
+        Args:
+            batch_size (int): Number of images in one batch.
+            input_shape (tuple[int]): height and width of the input image
+            dtype (obj:`torch.dtype`): data type of the tensors
+            device (obj:`torch.device`): device of the tensors
+        Return:
+            priors (Tensor): center priors of all levels, shape
+                (batch_size, num_points, 4). Shares memory across the batch.
+        """
+        key = (tuple(input_shape), dtype, device)
+        priors = self._center_priors_cache.get(key)
+        if priors is None:
+            input_height, input_width = input_shape
+            featmap_sizes = [
+                (math.ceil(input_height / stride), math.ceil(input_width) / stride)
+                for stride in self.strides
+            ]
+            # get grid cells of one image
+            mlvl_center_priors = [
+                self.get_single_level_center_priors(
+                    1,
+                    featmap_sizes[i],
+                    stride,
+                    dtype=dtype,
+                    device=device,
+                )
+                for i, stride in enumerate(self.strides)
+            ]
+            priors = torch.cat(mlvl_center_priors, dim=1)
+            self._center_priors_cache[key] = priors
+        return priors.expand(batch_size, -1, -1)
+
     def get_single_level_center_priors(
         self, batch_size, featmap_size, stride, dtype, device
     ):
@@ -23,27 +23,20 @@ def multiclass_nms(
         tuple: (bboxes, labels), tensors of shape (k, 5) and (k, 1). Labels \
             are 0-based.
     """
-    num_classes = multi_scores.size(1) - 1
     # exclude background category
-    if multi_bboxes.shape[1] > 4:
-        bboxes = multi_bboxes.view(multi_scores.size(0), -1, 4)
-    else:
-        bboxes = multi_bboxes[:, None].expand(multi_scores.size(0), num_classes, 4)
     scores = multi_scores[:, :-1]
 
-    # filter out boxes with low scores
+    # filter out boxes with low scores first and only gather the kept ones,
+    # instead of expanding the bboxes to (n, #class, 4) and masking them
     valid_mask = scores > score_thr
-
-    # We use masked_select for ONNX exporting purpose,
-    # which is equivalent to bboxes = bboxes[valid_mask]
-    # we have to use this ugly code
-    bboxes = torch.masked_select(
-        bboxes, torch.stack((valid_mask, valid_mask, valid_mask, valid_mask), -1)
-    ).view(-1, 4)
+    inds, labels = valid_mask.nonzero(as_tuple=True)
+    if multi_bboxes.shape[1] > 4:
+        bboxes = multi_bboxes.view(multi_scores.size(0), -1, 4)[inds, labels]
+    else:
+        bboxes = multi_bboxes[inds]
+    scores = scores[inds, labels]
     if score_factors is not None:
-        scores = scores * score_factors[:, None]
-    scores = torch.masked_select(scores, valid_mask)
-    labels = valid_mask.nonzero(as_tuple=False)[:, 1]
+        scores = scores * score_factors[inds]
 
     if bboxes.numel() == 0:
         bboxes = multi_bboxes.new_zeros((0, 5))
@@ -56,7 +49,9 @@ def multiclass_nms(
             )
         return bboxes, labels
 
-    dets, keep = batched_nms(bboxes, scores, labels, nms_cfg)
+    # with a single class the per class offsets are all zero, skip building them
+    class_agnostic = multi_scores.size(1) == 2
+    dets, keep = batched_nms(bboxes, scores, labels, nms_cfg, class_agnostic)
 
     if max_num > 0:
         dets = dets[:max_num]
@@ -13,16 +13,21 @@ def distance2bbox(points, distance, max_shape=None):
     Returns:
         Tensor: Decoded bboxes.
     """
-    x1 = points[..., 0] - distance[..., 0]
-    y1 = points[..., 1] - distance[..., 1]
-    x2 = points[..., 0] + distance[..., 2]
-    y2 = points[..., 1] + distance[..., 3]
+    # decode all four sides in one pass and clamp in place, instead of
+    # building and stacking every side separately
+    bboxes = torch.cat(
+        [points[..., :2] - distance[..., :2], points[..., :2] + distance[..., 2:]],
+        dim=-1,
+    )
     if max_shape is not None:
-        x1 = x1.clamp(min=0, max=max_shape[1])
-        y1 = y1.clamp(min=0, max=max_shape[0])
-        x2 = x2.clamp(min=0, max=max_shape[1])
-        y2 = y2.clamp(min=0, max=max_shape[0])
-    return torch.stack([x1, y1, x2, y2], -1)
+        height, width = max_shape[:2]
+        bboxes.clamp_(min=0, max=max(height, width))
+        # only the shorter side needs a second clamp on its strided columns
+        if height < width:
+            bboxes[..., 1::2].clamp_(max=height)
+        elif width < height:
+            bboxes[..., 0::2].clamp_(max=width)
+    return bboxes
 
 
 def bbox2distance(points, bbox, max_dis=None, eps=0.1):
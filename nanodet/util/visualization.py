@@ -19,26 +19,47 @@ import numpy as np
 import pycocotools.mask as mask_util
 from matplotlib.backends.backend_agg import FigureCanvasAgg
 
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
 _SMALL_OBJECT_AREA_THRESH = 1000
 
 
 def overlay_bbox_cv(img, dets, class_names, score_thresh):
-    all_box = []
-    for label in dets:
-        for bbox in dets[label]:
-            score = bbox[-1]
-            if score > score_thresh:
-                x0, y0, x1, y1 = [int(i) for i in bbox[:4]]
-                all_box.append([label, x0, y0, x1, y1, score])
-    all_box.sort(key=lambda v: v[5])
-    for box in all_box:
-        label, x0, y0, x1, y1, score = box
-        # color = self.cmap(i)[:3]
-        color = (_COLORS[label] * 255).astype(np.uint8).tolist()
-        text = "{}:{:.1f}%".format(class_names[label], score * 100)
-        txt_color = (0, 0, 0) if np.mean(_COLORS[label]) > 0.5 else (255, 255, 255)
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        txt_size = cv2.getTextSize(text, font, 0.5, 2)[0]
+    """Draw the detections with a score above ``score_thresh`` on the image
+    in place, the higher scores are drawn on top.
+
+    Args:
+        img (np.ndarray): BGR image.
+        dets (dict or tuple): Either {label: [[x0, y0, x1, y1, score], ...]}
+            or a tuple of bboxes (np.ndarray of shape (k, 5) in the same
+            format) and labels (np.ndarray of shape (k,)).
+        class_names (list[str]): Names of the classes.
+        score_thresh (float): Score threshold of the shown detections.
+    """
+    if isinstance(dets, dict):
+        bboxes = [bbox for label in dets for bbox in dets[label]]
+        labels = [label for label in dets for _ in dets[label]]
+        bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 5)
+        labels = np.array(labels, dtype=np.int64)
+    else:
+        bboxes, labels = dets
+    keep = bboxes[:, 4] > score_thresh
+    bboxes = bboxes[keep]
+    labels = labels[keep]
+    order = np.argsort(bboxes[:, 4], kind="stable")
+    bboxes = bboxes[order]
+    all_box = zip(
+        labels[order].tolist(),
+        bboxes[:, :4].astype(np.int32).tolist(),
+        bboxes[:, 4].tolist(),
+    )
+    for label, (x0, y0, x1, y1), score in all_box:
+        color = _BOX_COLORS[label]
+        txt_color = _TXT_COLORS[label]
+        text = f"{class_names[label]}:{score * 100:.1f}%"
+        # measured per box on purpose, a cached worst case width per label
+        # would change the drawn label backgrounds
+        txt_size = cv2.getTextSize(text, _FONT, 0.5, 2)[0]
         cv2.rectangle(img, (x0, y0), (x1, y1), color, 2)
 
         cv2.rectangle(
@@ -48,7 +69,7 @@ def overlay_bbox_cv(img, dets, class_names, score_thresh):
             color,
             -1,
         )
-        cv2.putText(img, text, (x0, y0 - 1), font, 0.5, txt_color, thickness=1)
+        cv2.putText(img, text, (x0, y0 - 1), _FONT, 0.5, txt_color, thickness=1)
     return img
 
 
@@ -740,3 +761,10 @@ _COLORS = (
     .astype(np.float32)
     .reshape(-1, 3)
 )
+
+# per label drawing colors of overlay_bbox_cv, looked up instead of
+# being converted for every box of every frame
+_BOX_COLORS = (_COLORS * 255).astype(np.uint8).tolist()
+_TXT_COLORS = [
+    (0, 0, 0) if np.mean(color) > 0.5 else (255, 255, 255) for color in _COLORS
+]
@@ -28,6 +28,12 @@ from ast import literal_eval
 
 import yaml
 
+try:
+    # libyaml based loader, much faster than the pure python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 # Flag for py2 and py3 compatibility to use when separate code paths are necessary
 # When _PY2 is False, we assume Python 3 is in use
 _PY2 = sys.version_info.major == 2
@@ -363,7 +369,7 @@ class CfgNode(dict):
     @classmethod
     def _load_cfg_from_yaml_str(cls, str_obj):
         """Load a config from a YAML string encoding."""
-        cfg_as_dict = yaml.safe_load(str_obj)
+        cfg_as_dict = yaml.load(str_obj, Loader=SafeLoader)
         return cls(cfg_as_dict)
 
     @classmethod
@@ -1,7 +1,9 @@
 import numpy as np
 import torch
+import torch.nn.functional as F
 
-from nanodet.model.head import build_head
+from nanodet.model.head import build_head, gfl_head
+from nanodet.model.head.gfl_head import Integral
 from nanodet.util.yacs import CfgNode
 
 
@@ -70,3 +72,67 @@ def test_gfl_head_loss():
     assert onegt_qfl_loss.item() > 0, "qfl loss should be non-zero"
     assert onegt_box_loss.item() > 0, "box loss should be non-zero"
     assert onegt_dfl_loss.item() > 0, "dfl loss should be non-zero"
+
+
+def test_integral():
+    torch.manual_seed(0)
+    reg_max = 7
+    integral = Integral(reg_max)
+    x = torch.randn(2, 100, 4 * (reg_max + 1)) * 10
+    out = integral(x)
+    assert out.shape == (2, 100, 4)
+
+    # should be equal to the expectation of the softmax distribution
+    prob = F.softmax(x.reshape(2, 100, 4, reg_max + 1), dim=-1)
+    expected = (prob * torch.arange(reg_max + 1, dtype=torch.float32)).sum(-1)
+    assert torch.allclose(out, expected, atol=1e-5)
+    assert out.min() >= 0 and out.max() <= reg_max + 1e-5
+
+
+def test_gfl_head_post_process(monkeypatch):
+    head_cfg = dict(
+        name="GFLHead",
+        num_classes=80,
+        input_channel=1,
+        feat_channels=96,
+        stacked_convs=2,
+        strides=[8, 16, 32],
+        loss=dict(
+            loss_qfl=dict(
+                name="QualityFocalLoss", use_sigmoid=True, beta=2.0, loss_weight=1.0
+            ),
+            loss_dfl=dict(name="DistributionFocalLoss", loss_weight=0.25),
+            loss_bbox=dict(name="GIoULoss", loss_weight=2.0),
+        ),
+    )
+    head = build_head(CfgNode(head_cfg))
+    feat = [torch.rand(2, 1, 320 // stride, 320 // stride) for stride in [8, 16, 32]]
+    meta = dict(
+        img=torch.rand((2, 3, 320, 320)),
+        warp_matrix=[np.eye(3), np.eye(3)],
+        img_info=dict(height=[320, 320], width=[320, 320], id=[0, 1]),
+    )
+    # record the scores given to nms to check the background padding
+    nms_scores = []
+    nms = gfl_head.multiclass_nms
+
+    def multiclass_nms(multi_bboxes, multi_scores, *args, **kwargs):
+        nms_scores.append(multi_scores.detach().clone())
+        return nms(multi_bboxes, multi_scores, *args, **kwargs)
+
+    monkeypatch.setattr(gfl_head, "multiclass_nms", multiclass_nms)
+
+    # post processing also works with gradients enabled
+    preds = head.forward(feat)
+    assert preds.requires_grad
+    results = head.post_process(preds, meta)
+    assert set(results.keys()) == {0, 1}
+    assert all(len(results[img_id]) == 80 for img_id in results)
+
+    # same scores as the sigmoid padded with a zero background per image
+    cls_preds = preds.detach()[..., :80]
+    assert len(nms_scores) == 2
+    for i, scores in enumerate(nms_scores):
+        padding = cls_preds.new_zeros(cls_preds.shape[1], 1)
+        expected = torch.cat([cls_preds[i].sigmoid(), padding], dim=1)
+        assert torch.equal(scores, expected)
@@ -1,7 +1,9 @@
+import math
+
 import numpy as np
 import torch
 
-from nanodet.model.head import build_head
+from nanodet.model.head import build_head, nanodet_plus_head
 from nanodet.util.yacs import CfgNode
 
 
@@ -128,3 +130,96 @@ def test_nanodet_plus_head_loss():
     assert onegt_aux_qfl_loss.item() > 0, "aux_qfl loss should be non-zero"
     assert onegt_aux_box_loss.item() > 0, "aux_box loss should be non-zero"
     assert onegt_aux_dfl_loss.item() > 0, "aux_dfl loss should be non-zero"
+
+
+def test_nanodet_plus_head_center_priors():
+    head_cfg = dict(
+        name="NanoDetPlusHead",
+        num_classes=80,
+        input_channel=1,
+        feat_channels=96,
+        stacked_convs=2,
+        conv_type="DWConv",
+        reg_max=7,
+        strides=[8, 16, 32, 64],
+        loss=dict(
+            loss_qfl=dict(
+                name="QualityFocalLoss", use_sigmoid=True, beta=2.0, loss_weight=1.0
+            ),
+            loss_dfl=dict(name="DistributionFocalLoss", loss_weight=0.25),
+            loss_bbox=dict(name="GIoULoss", loss_weight=2.0),
+        ),
+    )
+    head = build_head(CfgNode(head_cfg))
+
+    priors = head.get_center_priors(2, (320, 416), torch.float32, "cpu")
+    expected = torch.cat(
+        [
+            head.get_single_level_center_priors(
+                2,
+                (math.ceil(320 / stride), math.ceil(416 / stride)),
+                stride,
+                torch.float32,
+                "cpu",
+            )
+            for stride in [8, 16, 32, 64]
+        ],
+        dim=1,
+    )
+    assert torch.equal(priors, expected)
+    # the priors of the same input size are generated only once
+    assert (
+        head.get_center_priors(4, (320, 416), torch.float32, "cpu").data_ptr()
+        == priors.data_ptr()
+    )
+
+
+def test_nanodet_plus_head_post_process(monkeypatch):
+    head_cfg = dict(
+        name="NanoDetPlusHead",
+        num_classes=80,
+        input_channel=1,
+        feat_channels=96,
+        stacked_convs=2,
+        conv_type="DWConv",
+        reg_max=7,
+        strides=[8, 16, 32],
+        loss=dict(
+            loss_qfl=dict(
+                name="QualityFocalLoss", use_sigmoid=True, beta=2.0, loss_weight=1.0
+            ),
+            loss_dfl=dict(name="DistributionFocalLoss", loss_weight=0.25),
+            loss_bbox=dict(name="GIoULoss", loss_weight=2.0),
+        ),
+    )
+    head = build_head(CfgNode(head_cfg))
+    feat = [torch.rand(2, 1, 320 // stride, 320 // stride) for stride in [8, 16, 32]]
+    meta = dict(
+        img=torch.rand((2, 3, 320, 320)),
+        warp_matrix=[np.eye(3), np.eye(3)],
+        img_info=dict(height=[320, 320], width=[320, 320], id=[0, 1]),
+    )
+    # record the scores given to nms to check the background padding
+    nms_scores = []
+    nms = nanodet_plus_head.multiclass_nms
+
+    def multiclass_nms(multi_bboxes, multi_scores, *args, **kwargs):
+        nms_scores.append(multi_scores.detach().clone())
+        return nms(multi_bboxes, multi_scores, *args, **kwargs)
+
+    monkeypatch.setattr(nanodet_plus_head, "multiclass_nms", multiclass_nms)
+
+    # post processing also works with gradients enabled
+    preds = head.forward(feat)
+    assert preds.requires_grad
+    results = head.post_process(preds, meta)
+    assert set(results.keys()) == {0, 1}
+    assert all(len(results[img_id]) == 80 for img_id in results)
+
+    # same scores as the sigmoid padded with a zero background per image
+    cls_preds = preds.detach()[..., :80]
+    assert len(nms_scores) == 2
+    for i, scores in enumerate(nms_scores):
+        padding = cls_preds.new_zeros(cls_preds.shape[1], 1)
+        expected = torch.cat([cls_preds[i].sigmoid(), padding], dim=1)
+        assert torch.equal(scores, expected)
@@ -57,3 +57,57 @@ def test_multiclass_nms():
     )
     assert boxes.shape[0] == 0
     assert keep.shape[0] == 0
+
+
+def test_multiclass_nms_per_class_bboxes():
+    # each prior has one bbox for every class, (n, #class * 4)
+    multi_bboxes = torch.tensor(
+        [
+            [0.0, 0.0, 10.0, 10.0, 20.0, 20.0, 30.0, 30.0],
+            [50.0, 50.0, 60.0, 60.0, 70.0, 70.0, 80.0, 80.0],
+        ]
+    )
+    # the last column is the background class
+    multi_scores = torch.tensor([[0.1, 0.9, 0.0], [0.8, 0.01, 0.0]])
+    score_factors = torch.tensor([0.5, 1.0])
+    dets, labels = multiclass_nms(
+        multi_bboxes,
+        multi_scores,
+        score_thr=0.05,
+        nms_cfg=dict(iou_threshold=0.5),
+        score_factors=score_factors,
+    )
+    assert torch.equal(labels, torch.tensor([0, 1, 0]))
+    assert torch.allclose(
+        dets,
+        torch.tensor(
+            [
+                [50.0, 50.0, 60.0, 60.0, 0.8],
+                [20.0, 20.0, 30.0, 30.0, 0.45],
+                [0.0, 0.0, 10.0, 10.0, 0.05],
+            ]
+        ),
+    )
+
+
+def test_multiclass_nms_single_class():
+    file = open("./tests/data/batched_nms_data.pkl", "rb")
+    results = pickle.load(file)
+    det_boxes = torch.from_numpy(results["boxes"])
+
+    # one class plus the background column
+    socres = torch.rand(det_boxes.shape[0], 2)
+    nms_cfg = dict(iou_threshold=0.5)
+    boxes, labels = multiclass_nms(
+        det_boxes, socres, score_thr=0.3, nms_cfg=nms_cfg, max_num=-1
+    )
+    valid = socres[:, 0] > 0.3
+    ref_boxes, _ = batched_nms(
+        det_boxes[valid],
+        socres[valid, 0],
+        torch.zeros(int(valid.sum()), dtype=torch.long),
+        nms_cfg,
+        class_agnostic=False,
+    )
+    assert torch.equal(boxes, ref_boxes)
+    assert torch.all(labels == 0)
@@ -0,0 +1,43 @@
+import pytest
+import torch
+
+from nanodet.util import distance2bbox
+
+
+def _distance2bbox_per_side(points, distance, max_shape=None):
+    x1 = points[..., 0] - distance[..., 0]
+    y1 = points[..., 1] - distance[..., 1]
+    x2 = points[..., 0] + distance[..., 2]
+    y2 = points[..., 1] + distance[..., 3]
+    if max_shape is not None:
+        x1 = x1.clamp(min=0, max=max_shape[1])
+        y1 = y1.clamp(min=0, max=max_shape[0])
+        x2 = x2.clamp(min=0, max=max_shape[1])
+        y2 = y2.clamp(min=0, max=max_shape[0])
+    return torch.stack([x1, y1, x2, y2], -1)
+
+
+@pytest.mark.parametrize(
+    "max_shape", [None, (320, 320), (320, 416), (416, 320)], ids=str
+)
+def test_distance2bbox(max_shape):
+    torch.manual_seed(0)
+    # points are expanded from the priors of one image like in the heads
+    points = (torch.rand(1, 500, 2) * 500 - 50).expand(2, -1, -1)
+    distance = torch.rand(2, 500, 4) * 100
+    distance.requires_grad_()
+    expected_distance = distance.detach().clone().requires_grad_()
+
+    bboxes = distance2bbox(points, distance, max_shape)
+    expected = _distance2bbox_per_side(points, expected_distance, max_shape)
+    assert torch.equal(bboxes, expected)
+    if max_shape is not None:
+        # boxes on all sides are clipped
+        assert (expected == 0).any()
+        assert (expected[..., 0::2] == max_shape[1]).any()
+        assert (expected[..., 1::2] == max_shape[0]).any()
+
+    grad = torch.randn_like(expected)
+    bboxes.backward(grad)
+    expected.backward(grad)
+    assert torch.equal(distance.grad, expected_distance.grad)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from nanodet.util import overlay_bbox_cv
+
+
+def test_overlay_bbox_cv():
+    class_names = ["person", "car", "dog"]
+    dets = {
+        0: [[10.5, 20.0, 100.9, 120.0, 0.9], [50.0, 60.0, 90.0, 100.0, 0.2]],
+        1: [],
+        2: [[30.0, 40.0, 150.0, 160.0, 0.6]],
+    }
+    img = np.zeros((200, 200, 3), dtype=np.uint8)
+    dict_result = overlay_bbox_cv(img.copy(), dets, class_names, 0.35)
+    assert dict_result.any()
+
+    bboxes = np.array(
+        [
+            [30.0, 40.0, 150.0, 160.0, 0.6],
+            [50.0, 60.0, 90.0, 100.0, 0.2],
+            [10.5, 20.0, 100.9, 120.0, 0.9],
+        ],
+        dtype=np.float32,
+    )
+    labels = np.array([2, 0, 0])
+    array_result = overlay_bbox_cv(img.copy(), (bboxes, labels), class_names, 0.35)
+    assert np.array_equal(dict_result, array_result)
+
+    # nothing is drawn when all scores are below the threshold
+    result = overlay_bbox_cv(img.copy(), (bboxes, labels), class_names, 0.95)
+    assert not result.any()
+    result = overlay_bbox_cv(img.copy(), {}, class_names, 0.35)
+    assert not result.any()